@@ -1,26 +1,174 @@
+import functools
 import json
 import re
 import os
-from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import ahocorasick
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库 json
+    orjson = None  # type: ignore[assignment]
+
+# 连续空白字符
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 是否包含数字（没有数字时直接走中文数字解析）
+_DIGIT_RE = re.compile(r'\d')
+
+# 金额匹配：数字 + 可选货币单位，一次扫描同时覆盖带单位与纯数字两种情况
+_AMOUNT_RE = re.compile(r'(\d+\.?\d*)\s*(元|块|￥|\$|yuan|dollar)?', re.IGNORECASE)
+
+# 金额单位优先级（数值越小越优先），其余单位（元/块/￥/$）为0，纯数字最后
+_AMOUNT_UNIT_PRIORITY = {"yuan": 1, "dollar": 2}
+_BARE_NUMBER_PRIORITY = 3
+
+# 没有动作关键词时，出现这些货币单位默认推测为支出
+_EXPENSE_HINT_RE = re.compile(r'[块元￥$欧刀]|yuan|dollar')
+
+# 还款场景的触发词（"还款"已被"还"覆盖），以及还款时不能作为支付方式的债务账户
+_REPAY_RE = re.compile(r'还|pay off|repay')
+_DEBT_KEYWORDS = ("信用卡", "花呗", "白条", "房贷", "车贷")
+
+# 信用类支付方式对应的负债账户
+_CREDIT_ACCOUNTS = {
+    "信用卡": "信用卡欠款",
+    "花呗": "花呗",
+    "白条": "白条"
+}
+
+# 每个解析器缓存最近解析过的文本条数
+_PARSE_CACHE_SIZE = 4096
+
+# 置信度权重：动作、金额、支付方式、分类
+_CONFIDENCE_WEIGHTS = (0.3, 0.4, 0.2, 0.1)
+
+class ParseData(NamedTuple):
+    """解析成功时的交易数据"""
+    action: Optional[str]
+    amount: Optional[float]
+    description: str
+    category: str
+    payment_method: Optional[str]
+    debit_account: str
+    credit_account: str
+    confidence: float
+
+
+class PartialParseData(NamedTuple):
+    """缺少必要信息时已解析出的部分数据"""
+    action: Optional[str]
+    amount: Optional[float]
+    payment_method: Optional[str]
+    category: Optional[str]
+    description: str
+
+
+class ParseResult(NamedTuple):
+    """解析结果的不可变形式，供解析缓存保存；parse() 对外仍转换成字典返回"""
+    success: bool
+    data: Optional[Union[ParseData, PartialParseData]]
+    message: str
+    missing_info: Tuple[str, ...]
+
 
 class TransactionParser:
-    def __init__(self):
+    __slots__ = (
+        "config_path", "keywords", "categories", "accounts",
+        "_automata", "_action_order", "_chinese_numbers", "_chinese_number_rank",
+        "_chinese_number_re", "_parse_cached",
+    )
+    
+    # 已加载的配置文件（按路径缓存），同一进程内的解析器实例共享
+    _config_cache: Dict[str, dict] = {}
+    
+    def __init__(self) -> None:
         self.config_path = "config"
         self.keywords = self._load_config("keywords.json")
         self.categories = self._load_config("categories.json") 
         self.accounts = self._load_config("accounts.json")
+        self._automata = self._build_automata()
+        # 优先还款动作（避免被expense覆盖），其余按配置顺序
+        actions = self.keywords.get("actions", {})
+        self._action_order: Tuple[str, ...] = tuple(sorted(actions, key=lambda a: a != "loan_payment"))
+        self._chinese_numbers = self.keywords.get("amount_patterns", {}).get("number_words", {}).get("chinese", {})
+        # 配置中靠前的数字词优先
+        self._chinese_number_rank = {word: rank for rank, word in enumerate(self._chinese_numbers)}
+        self._chinese_number_re = self._build_chinese_number_re()
+        # 解析结果不可变，相同文本直接复用（按实例缓存）
+        self._parse_cached = functools.lru_cache(maxsize=_PARSE_CACHE_SIZE)(self._parse_text)
         
     def _load_config(self, filename: str) -> dict:
-        """加载配置文件"""
+        """加载配置文件（每个文件只从磁盘读取一次）"""
+        path = os.path.join(self.config_path, filename)
+        config = self._config_cache.get(path)
+        if config is not None:
+            return config
+        
         try:
-            with open(os.path.join(self.config_path, filename), 'r', encoding='utf-8') as f:
-                return json.load(f)
+            if orjson is not None:
+                with open(path, 'rb') as f:
+                    config = orjson.loads(f.read())
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
         except FileNotFoundError:
             print(f"配置文件 {filename} 未找到")
             return {}
-        except json.JSONDecodeError:
+        except json.JSONDecodeError:  # orjson.JSONDecodeError 也是它的子类
             print(f"配置文件 {filename} 格式错误")
             return {}
+        
+        self._normalize_keywords(config)
+        self._config_cache[path] = config
+        return config
+    
+    def _normalize_keywords(self, config: dict) -> None:
+        """整理配置中的关键词列表：英文转小写（解析时只需把文本小写一次），去重并按长度从长到短排列"""
+        for key, value in config.items():
+            if key in ("chinese", "english") and isinstance(value, list):
+                words = [word.lower() for word in value] if key == "english" else value
+                config[key] = sorted(dict.fromkeys(words), key=len, reverse=True)
+            elif isinstance(value, dict):
+                self._normalize_keywords(value)
+    
+    def _build_automata(self) -> Dict[str, "ahocorasick.Automaton"]:
+        """构建动作、支付方式、费用分类的关键词自动机（中文按原文匹配，英文按小写匹配）"""
+        index: Dict[str, Dict[str, List[Tuple[str, str, int]]]] = {"chinese": {}, "english": {}}
+        
+        def add_words(words_dict: dict, entry: Tuple[str, str, int]) -> None:
+            for lang, words in index.items():
+                for word in words_dict.get(lang, []):
+                    if word:
+                        words.setdefault(word, []).append(entry)
+        
+        for action_type, words_dict in self.keywords.get("actions", {}).items():
+            add_words(words_dict, ("action", action_type, 0))
+        for method_name, aliases_dict in self.keywords.get("payment_methods", {}).items():
+            add_words(aliases_dict, ("payment_method", method_name, 0))
+        for category_name, config in self.categories.get("expense_categories", {}).items():
+            add_words(config.get("keywords", {}), ("category", category_name, 2))
+            add_words(config.get("merchants", {}), ("category", category_name, 3))  # 商户权重更高
+        
+        automata = {}
+        for lang, words in index.items():
+            if not words:
+                continue
+            automaton = ahocorasick.Automaton()
+            for word, entries in words.items():
+                automaton.add_word(word, (word, tuple(entries)))
+            automaton.make_automaton()
+            automata[lang] = automaton
+        return automata
+    
+    def _build_chinese_number_re(self) -> Optional["re.Pattern[str]"]:
+        """把中文数字词编译成一个正则（长词优先），要求后面3个字符内出现货币单位"""
+        if not self._chinese_numbers:
+            return None
+        words = sorted(self._chinese_numbers, key=len, reverse=True)
+        return re.compile("(" + "|".join(map(re.escape, words)) + r")(?=.{0,2}[元块￥])")
     
     def parse(self, text: str) -> dict:
         """
@@ -33,17 +181,19 @@ class TransactionParser:
             dict: 包含解析结果的字典
         """
         if not text.strip():
-            return self._error_result("输入为空")
+            return self._result_to_dict(self._error_result("输入为空"))
         
+        # 预处理文本
+        return self._result_to_dict(self._parse_cached(self._preprocess_text(text)))
+    
+    def _parse_text(self, text: str) -> ParseResult:
+        """解析预处理后的文本"""
         try:
-            # 预处理文本
-            text = self._preprocess_text(text)
+            text_lower = text.lower()
             
             # 解析各个组件
-            action = self._parse_action(text)
+            action, payment_method, category = self._parse_keywords(text, text_lower)
             amount = self._parse_amount(text)
-            payment_method = self._parse_payment_method(text)
-            category = self._parse_category(text)
             
             # 验证必要信息
             missing_info = []
@@ -53,7 +203,7 @@ class TransactionParser:
                 missing_info.append("amount")
                 
             if missing_info:
-                return self._partial_result(text, action, amount, payment_method, category, missing_info)
+                return self._partial_result(text, action, amount, payment_method, category, tuple(missing_info))
             
             # 生成会计分录
             accounting_entry = self._generate_accounting_entry(action, amount, payment_method, category, text)
@@ -64,21 +214,17 @@ class TransactionParser:
             # 计算置信度
             confidence = self._calculate_confidence(text, action, amount, payment_method, category)
             
-            return {
-                'success': True,
-                'data': {
-                    'action': action,
-                    'amount': amount,
-                    'description': text,
-                    'category': category or "其他费用",
-                    'payment_method': payment_method,
-                    'debit_account': accounting_entry['debit'],
-                    'credit_account': accounting_entry['credit'],
-                    'confidence': confidence
-                },
-                'message': "解析成功",
-                'missing_info': []
-            }
+            data = ParseData(
+                action=action,
+                amount=amount,
+                description=text,
+                category=category or "其他费用",
+                payment_method=payment_method,
+                debit_account=accounting_entry['debit'],
+                credit_account=accounting_entry['credit'],
+                confidence=confidence
+            )
+            return ParseResult(True, data, "解析成功", ())
         except Exception as e:
             return self._error_result(f"解析异常: {str(e)}")
     
@@ -87,150 +233,99 @@ class TransactionParser:
         """预处理文本"""
         # 转换为小写（英文部分）
         # 去除多余空格
-        text = re.sub(r'\s+', ' ', text.strip())
+        text = _WHITESPACE_RE.sub(' ', text.strip())
         return text
     
-    def _parse_action(self, text: str) -> Optional[str]:
-        """解析动作类型 - 优先检查还款动作"""
-        actions = self.keywords.get("actions", {})
-        
-        # 优先检查还款动作（避免被expense覆盖）
-        if "loan_payment" in actions:
-            loan_words = actions["loan_payment"]
-            for word in loan_words.get("chinese", []):
-                if word in text:
-                    return "loan_payment"
-            for word in loan_words.get("english", []):
-                if word.lower() in text.lower():
-                    return "loan_payment"
-        
-        # 再检查其他动作
-        for action_type, words_dict in actions.items():
-            if action_type == "loan_payment":  # 已经检查过了
-                continue
-                
-            for word in words_dict.get("chinese", []):
-                if word in text:
-                    return action_type
-            for word in words_dict.get("english", []):
-                if word.lower() in text.lower():
-                    return action_type
-        
-        # 默认推测
-        if any(word in text for word in ["块", "元", "￥", "$", "yuan", "dollar", "欧", "刀"]):
+    def _guess_action(self, text: str) -> Optional[str]:
+        """没有动作关键词时，根据货币单位默认推测为支出"""
+        if _EXPENSE_HINT_RE.search(text):
             return "expense"
             
         return None
     
+    def _parse_keywords(self, text: str, text_lower: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """用关键词自动机一次扫描文本，同时解析动作、支付方式和费用分类"""
+        repayment = _REPAY_RE.search(text) is not None
+        
+        actions = set()
+        payment_methods = set()
+        scores: "Counter[str]" = Counter()
+        for lang, target in (("chinese", text), ("english", text_lower)):
+            automaton = self._automata.get(lang)
+            if automaton is None:
+                continue
+            # 同一关键词出现多次只计一次
+            for word, entries in {value for _, value in automaton.iter(target)}:
+                for field, label, weight in entries:
+                    if field == "action":
+                        actions.add(label)
+                    elif field == "payment_method":
+                        # 还款场景下，不要把债务账户当作支付方式
+                        if repayment and (any(debt in label for debt in _DEBT_KEYWORDS)
+                                          or (lang == "chinese" and word in _DEBT_KEYWORDS)):
+                            continue
+                        payment_methods.add(label)
+                    else:
+                        scores[label] += weight
+        
+        # 优先还款动作，其余按配置顺序
+        action = next((a for a in self._action_order if a in actions), None) or self._guess_action(text)
+        
+        payment_method = next((m for m in self.keywords.get("payment_methods", {}) if m in payment_methods), None)
+        
+        category = None
+        max_score = 0
+        for category_name in self.categories.get("expense_categories", {}):
+            if scores.get(category_name, 0) > max_score:
+                max_score = scores[category_name]
+                category = category_name
+        
+        return action, payment_method, category
+    
     def _parse_amount(self, text: str) -> Optional[float]:
         """解析金额"""
-        # 正则表达式匹配各种金额格式
-        patterns = [
-            r'(\d+\.?\d*)\s*[元块￥$]',  # 25元, 25.5块
-            r'(\d+\.?\d*)\s*yuan',       # 25 yuan
-            r'(\d+\.?\d*)\s*dollar',     # 25 dollar
-            r'(\d+\.?\d*)',              # 纯数字（最后尝试）
-        ]
+        if not _DIGIT_RE.search(text):
+            # 没有阿拉伯数字，尝试解析中文数字
+            return self._parse_chinese_number(text)
         
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    return float(matches[0])
-                except ValueError:
-                    continue
+        # 按单位优先级取金额：25元/25块/25￥/25$ > 25 yuan > 25 dollar > 纯数字，同级取第一个
+        best_priority = _BARE_NUMBER_PRIORITY + 1
+        best_number: Optional[str] = None
+        for match in _AMOUNT_RE.finditer(text):
+            unit = match.group(2)
+            if unit is None:
+                priority = _BARE_NUMBER_PRIORITY
+            else:
+                priority = _AMOUNT_UNIT_PRIORITY.get(unit.lower(), 0)
+            if priority == 0:
+                return float(match.group(1))
+            if priority < best_priority:
+                best_priority = priority
+                best_number = match.group(1)
         
-        # 尝试解析中文数字
-        return self._parse_chinese_number(text)
+        return float(best_number) if best_number is not None else None
     
     def _parse_chinese_number(self, text: str) -> Optional[float]:
         """解析中文数字"""
-        try:
-            chinese_nums = self.keywords.get("amount_patterns", {}).get("number_words", {}).get("chinese", {})
-            
-            # 简单实现：只处理基本的中文数字
-            for chinese, value in chinese_nums.items():
-                if chinese in text and str(value) not in text:  # 避免重复匹配
-                    # 查找紧跟的单位
-                    idx = text.find(chinese)
-                    after = text[idx + len(chinese):idx + len(chinese) + 3]  # 增加搜索长度
-                    if any(unit in after for unit in ["元", "块", "￥"]):
-                        return float(value)
-            
-            return None
-        except Exception as e:
-            print(f"中文数字解析异常: {e}")
+        if self._chinese_number_re is None:
             return None
-    
-    def _parse_payment_method(self, text: str) -> Optional[str]:
-        """解析支付方式"""
-        # 如果是还款动作，不要把债务账户当作支付方式
-        if any(word in text for word in ["还", "还款", "pay off", "repay"]):
-            # 还款场景下，寻找非债务的支付方式
-            payment_methods = self.keywords.get("payment_methods", {})
-            debt_keywords = ["信用卡", "花呗", "白条", "房贷", "车贷"]
-            
-            for method_name, aliases_dict in payment_methods.items():
-                # 跳过债务相关的支付方式
-                if any(debt in method_name for debt in debt_keywords):
-                    continue
-                    
-                for alias in aliases_dict.get("chinese", []):
-                    if alias in text and alias not in debt_keywords:
-                        return method_name
-                for alias in aliases_dict.get("english", []):
-                    if alias.lower() in text.lower():
-                        return method_name
-        else:
-            # 正常的支付方式解析
-            payment_methods = self.keywords.get("payment_methods", {})
-            for method_name, aliases_dict in payment_methods.items():
-                for alias in aliases_dict.get("chinese", []):
-                    if alias in text:
-                        return method_name
-                for alias in aliases_dict.get("english", []):
-                    if alias.lower() in text.lower():
-                        return method_name
         
-        return None
-    
-    def _parse_category(self, text: str) -> Optional[str]:
-        """解析费用分类"""
-        categories = self.categories.get("expense_categories", {})
-        
-        best_match = None
-        max_score = 0
-        
-        for category_name, config in categories.items():
-            score = 0
-            
-            # 检查关键词匹配
-            keywords = config.get("keywords", {})
-            for keyword in keywords.get("chinese", []):
-                if keyword in text:
-                    score += 2
-            for keyword in keywords.get("english", []):
-                if keyword.lower() in text.lower():
-                    score += 2
-            
-            # 检查商户匹配（权重更高）
-            merchants = config.get("merchants", {})
-            for merchant in merchants.get("chinese", []):
-                if merchant in text:
-                    score += 3
-            for merchant in merchants.get("english", []):
-                if merchant.lower() in text.lower():
-                    score += 3
-            
-            if score > max_score:
-                max_score = score
-                best_match = category_name
-        
-        return best_match
+        # 简单实现：只处理基本的中文数字
+        # 与逐词查找一致：每个数字词只看它第一次出现的位置，多个命中时取配置中靠前的
+        best = None
+        for match in self._chinese_number_re.finditer(text):
+            word = match.group(1)
+            if match.start() != text.find(word):
+                continue
+            if best is None or self._chinese_number_rank[word] < self._chinese_number_rank[best]:
+                best = word
         
+        return float(self._chinese_numbers[best]) if best is not None else None
+    
     def _parse_debt_account(self, text: str) -> Optional[str]:
         """解析负债账户类型"""
         liability_accounts = self.accounts.get("liability_accounts", {})
+        text_lower = text.lower()
         
         best_match = None
         max_score = 0
@@ -246,7 +341,7 @@ class TransactionParser:
             
             # 检查英文别名匹配  
             for alias in aliases.get("english", []):
-                if alias.lower() in text.lower():
+                if alias in text_lower:
                     score += len(alias)
             
             if score > max_score:
@@ -255,23 +350,16 @@ class TransactionParser:
         
         return best_match
 
-    def _map_payment_to_account(self, payment_method: str, action: str) -> str:
+    def _map_payment_to_account(self, payment_method: Optional[str], action: str) -> str:
         if not payment_method:
             if action == "loan_payment":
                 return "银行存款"  # 还款默认用银行转账
             else:
                 return "现金" 
         
-        # 信用类支付方式映射到负债账户
-        credit_mapping = {
-            "信用卡": "信用卡欠款",
-            "花呗": "花呗", 
-            "白条": "白条"
-        }
-        
         # 如果是信用类支付，直接返回对应的负债账户
-        if payment_method in credit_mapping:
-            return credit_mapping[payment_method]
+        if payment_method in _CREDIT_ACCOUNTS:
+            return _CREDIT_ACCOUNTS[payment_method]
         
         # 其他支付方式（支付宝、微信、现金等）直接返回
         return payment_method
@@ -279,8 +367,8 @@ class TransactionParser:
 
 
     
-    def _generate_accounting_entry(self, action: str, amount: float, 
-                                payment_method: str, category: str, text: str = "") -> Optional[dict]:
+    def _generate_accounting_entry(self, action: Optional[str], amount: Optional[float], 
+                                payment_method: Optional[str], category: Optional[str], text: str = "") -> Optional[dict]:
         """生成会计分录"""
         if action == "expense":
             # 支出：借方是费用账户，贷方是资产/负债账户
@@ -310,49 +398,39 @@ class TransactionParser:
         
         return None
     
-    def _calculate_confidence(self, text: str, action: str, amount: float, 
-                            payment_method: str, category: str) -> float:
+    def _calculate_confidence(self, text: str, action: Optional[str], amount: Optional[float], 
+                            payment_method: Optional[str], category: Optional[str]) -> float:
         """计算解析置信度"""
-        confidence = 0.0
-        
-        # 基础分数
-        if action:
-            confidence += 0.3
-        if amount:
-            confidence += 0.4
-        if payment_method:
-            confidence += 0.2
-        if category:
-            confidence += 0.1
-            
+        fields = (action, amount, payment_method, category)
+        confidence = sum(weight for value, weight in zip(fields, _CONFIDENCE_WEIGHTS) if value)
         return min(confidence, 1.0)
     
-    def _error_result(self, message: str) -> dict:
+    def _error_result(self, message: str) -> ParseResult:
         """返回错误结果"""
-        return {
-            'success': False,
-            'data': None,
-            'message': message,
-            'missing_info': []
-        }
+        return ParseResult(False, None, message, ())
     
-    def _partial_result(self, text: str, action: str, amount: float, 
-                       payment_method: str, category: str, missing_info: list) -> dict:
+    def _partial_result(self, text: str, action: Optional[str], amount: Optional[float], 
+                       payment_method: Optional[str], category: Optional[str],
+                       missing_info: Tuple[str, ...]) -> ParseResult:
         """返回部分解析结果"""
+        data = PartialParseData(
+            action=action,
+            amount=amount,
+            payment_method=payment_method,
+            category=category,
+            description=text
+        )
+        return ParseResult(False, data, f"缺少信息: {', '.join(missing_info)}", missing_info)
+    
+    def _result_to_dict(self, result: ParseResult) -> dict:
+        """把解析结果转换成字典（接口以JSON返回，校验和入库也按字典读取；每次调用都生成新字典，缓存内容不会被修改）"""
         return {
-            'success': False,
-            'data': {
-                'action': action,
-                'amount': amount,
-                'payment_method': payment_method,
-                'category': category,
-                'description': text
-            },
-            'message': f"缺少信息: {', '.join(missing_info)}",
-            'missing_info': missing_info
+            'success': result.success,
+            'data': result.data._asdict() if result.data is not None else None,
+            'message': result.message,
+            'missing_info': list(result.missing_info)
         }
 
-
 # 简单测试代码
 if __name__ == "__main__":
     parser = TransactionParser()